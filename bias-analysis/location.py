@@ -1,29 +1,31 @@
 import json
+import io
+import gzip
 import boto3
+from collections import defaultdict
 from typing import Dict, Any, List
 from datetime import datetime
 
+s3_client = boto3.client('s3')
+
 def process_holdings_to_locations(holdings: List[Dict[str, Any]]) -> Dict[str, float]:
     print(f"Processing {len(holdings)} holdings for location analysis")
-    location_allocations = {}
+    location_allocations = defaultdict(float)
     total_percentage = 0.0
     processed_count = 0
-    
+    skipped_count = 0
+
     for i, holding in enumerate(holdings):
         try:
-            country = holding.get('country', '').strip() if holding.get('country') else ''
-            city = holding.get('city', '').strip() if holding.get('city') else ''
-            state = holding.get('state', '').strip() if holding.get('state') else ''
+            country = (holding.get('country') or '').strip()
+            city = (holding.get('city') or '').strip()
+            state = (holding.get('state') or '').strip()
             percentage = holding.get('portfolio_percentage', 0.0)
-            
-            if percentage <= 0:
-                print(f"Skipping holding {i}: percentage {percentage} <= 0")
-                continue
-            
-            if not country and not city and not state:
-                print(f"Skipping holding {i}: no location data")
+
+            if percentage <= 0 or (not country and not city and not state):
+                skipped_count += 1
                 continue
-                
+
             total_percentage += percentage
             processed_count += 1
             
@@ -37,16 +39,14 @@ def process_holdings_to_locations(holdings: List[Dict[str, Any]]) -> Dict[str, f
             else:
                 location = country
             
-            if location in location_allocations:
-                location_allocations[location] += percentage
-            else:
-                location_allocations[location] = percentage
-                
+            location_allocations[location] += percentage
+
+
         except Exception as e:
             print(f"Error processing holding {i}: {str(e)}")
             continue
     
-    print(f"Successfully processed {processed_count} out of {len(holdings)} holdings")
+    print(f"Successfully processed {processed_count} out of {len(holdings)} holdings ({skipped_count} skipped)")
     
     if total_percentage > 0:
         location_allocations = {
@@ -82,8 +82,8 @@ def save_to_s3(bucket_name: str, key: str, data: Dict[str, Any]) -> bool:
     """
     try:
         print(f"Attempting to save to S3 bucket: {bucket_name}, key: {key}")
-        s3 = boto3.client('s3')
-        
+        s3 = s3_client
+
         # Check if bucket exists
         try:
             s3.head_bucket(Bucket=bucket_name)
@@ -92,12 +92,12 @@ def save_to_s3(bucket_name: str, key: str, data: Dict[str, Any]) -> bool:
             print(f"Error accessing S3 bucket '{bucket_name}': {str(bucket_error)}")
             return False
         
-        # Attempt to put object
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=key,
-            Body=json.dumps(data, indent=2),
-            ContentType='application/json'
+        # Attempt to upload object
+        s3.upload_fileobj(
+            io.BytesIO(gzip.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))),
+            bucket_name,
+            key,
+            ExtraArgs={'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
         )
         print(f"Successfully saved to S3: s3://{bucket_name}/{key}")
         return True
@@ -155,15 +155,15 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 })
             }
         
-        # Validate portfolio percentages are reasonable
-        print("Validating portfolio percentages")
-        total_percentage = sum(holding.get('portfolio_percentage', 0.0) for holding in holdings)
-        print(f"Total portfolio percentage: {total_percentage:.2f}%")
-        
-        # Check for reasonable percentage range (0-100% per holding, total can be less than 100% due to ETFs/bonds)
+        # Validate portfolio percentages and location fields in a single pass
+        # (0-100% per holding, total can be less than 100% due to ETFs/bonds)
+        print("Validating portfolio percentages and location fields")
+        total_percentage = 0.0
+        missing_location_count = 0
+        missing_country_count = 0
         for i, holding in enumerate(holdings):
             percentage = holding.get('portfolio_percentage', 0.0)
-            
+
             # Validate data type
             if not isinstance(percentage, (int, float)):
                 print(f"ERROR: Invalid data type for portfolio_percentage in holding {i}: {type(percentage)}")
@@ -173,7 +173,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'error': f'Portfolio percentage must be a number. Found {type(percentage).__name__} in holding {i}'
                     })
                 }
-            
+
             if percentage < 0 or percentage > 100:
                 print(f"ERROR: Invalid portfolio percentage: {percentage:.2f}% for holding {i}")
                 return {
@@ -182,7 +182,23 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'error': f'Portfolio percentages must be between 0% and 100%. Found: {percentage:.2f}% in holding {i}'
                     })
                 }
-        
+
+            total_percentage += percentage
+
+            country = holding.get('country', '')
+            city = holding.get('city', '')
+            state = holding.get('state', '')
+
+            # Check if at least one location field is provided
+            if not country and not city and not state:
+                missing_location_count += 1
+            elif not country:
+                missing_country_count += 1
+
+        if missing_location_count or missing_country_count:
+            print(f"WARNING: {missing_location_count} holdings with no location data, {missing_country_count} missing country field")
+        print(f"Total portfolio percentage: {total_percentage:.2f}%")
+
         if total_percentage > 100:
             print(f"ERROR: Total portfolio percentage exceeds 100%. Current sum: {total_percentage:.2f}%")
             return {
@@ -192,23 +208,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 })
             }
         
-        print("Portfolio percentage validation passed")
-        
-        # Validate location fields in holdings
-        print("Validating location fields")
-        for i, holding in enumerate(holdings):
-            country = holding.get('country', '')
-            city = holding.get('city', '')
-            state = holding.get('state', '')
-            
-            # Check if at least one location field is provided
-            if not country and not city and not state:
-                print(f"WARNING: Holding {i} has no location data (country, city, or state)")
-            elif not country:
-                print(f"WARNING: Holding {i} missing country field")
-        
-        print("Location field validation completed")
-        
+        print("Portfolio percentage and location field validation passed")
+
         # Process holdings to get location allocations
         print("Processing holdings for location analysis")
         user_locations = process_holdings_to_locations(holdings)
@@ -246,7 +247,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'message': 'Location analysis completed successfully',
                     'unique_identifier': unique_identifier,
                     'weighted_locations': weighted_locations,
-                    's3_location': f's3://{bucket_name}/{s3_key}'
+                    's3_location': f's3://{bucket_name}/{s3_key}',
+                    'result': response_data
                 })
             }
         else:
@@ -1,6 +1,7 @@
 import json
+import io
+import gzip
 import boto3
-import yfinance as yf
 
 s3_client = boto3.client('s3')
 RESULTS_BUCKET = "hidden-for-github"
@@ -13,15 +14,10 @@ def lambda_handler(event, context):
         data = event.get("data", {})
         holdings = data.get("holdings", [])
 
-        weighted_trailing_return = 0
-
-
-        for holding in holdings:
-            trailing_return_1m = holding.get('trailing_return_1m') or 0
-            portfolio_percentage = holding.get('portfolio_percentage') or 0
-
-            contribution = trailing_return_1m * (portfolio_percentage/100)
-            weighted_trailing_return += contribution
+        weighted_trailing_return = sum(
+            (holding.get('trailing_return_1m') or 0) * ((holding.get('portfolio_percentage') or 0) / 100)
+            for holding in holdings
+        )
 
         print(weighted_trailing_return)
         sp500_momentum = 3.5
@@ -41,11 +37,11 @@ def lambda_handler(event, context):
 
         s3_key = f"results/{uniqueIdentifier}/momentum_results.json"
 
-        s3_client.put_object(
-            Bucket=RESULTS_BUCKET,
-            Key=s3_key,
-            Body=json.dumps(result),
-            ContentType='application/json'
+        s3_client.upload_fileobj(
+            io.BytesIO(gzip.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))),
+            RESULTS_BUCKET,
+            s3_key,
+            ExtraArgs={'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
         )
 
     except Exception as e:
@@ -57,5 +53,5 @@ def lambda_handler(event, context):
 
     return {
         'statusCode': 200,
-        'body': json.dumps('Momentum calculation complete!')
+        'body': json.dumps({'message': 'Momentum calculation complete!', 'result': result})
     }
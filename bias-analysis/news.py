@@ -2,11 +2,14 @@ import json
 import requests
 import os
 
+# reuse pooled connections to Vercel across warm invocations
+session = requests.Session()
+
 def lambda_handler(event, context):
     vercel_url = "hidden-for-github"
-    
+
     try:
-        response = requests.post(vercel_url, json=event, timeout=60)
+        response = session.post(vercel_url, json=event, timeout=60)
         response.raise_for_status()
         return {
             "statusCode": 200,
@@ -1,9 +1,25 @@
 import json
+import io
+import gzip
 import boto3
 import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, Any, List
 from datetime import datetime
 
+s3_client = boto3.client('s3')
+bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
+
+# runs the Bedrock round-trip in the background while the handler keeps working
+bedrock_executor = ThreadPoolExecutor(max_workers=1)
+
+# everything but the prompt text is constant, so the request body is
+# preformatted once and only the JSON-encoded prompt is spliced in per call
+BEDROCK_MODEL_ID = 'anthropic.claude-3-sonnet-20240229-v1:0'
+BEDROCK_BODY_PREFIX = '{"anthropic_version":"bedrock-2023-05-31","max_tokens":200,"messages":[{"role":"user","content":'
+BEDROCK_BODY_SUFFIX = '}]}'
+
 sp500_sectors = {
     "Information Technology": 27.5,
     "Health Care": 13.5,
@@ -25,32 +41,38 @@ def normalize_sector_allocations(sectors: Dict[str, float]) -> Dict[str, float]:
     
     return {sector: (percentage / total) * 100 for sector, percentage in sectors.items()}
 
-def calculate_similarity(sp500: Dict[str, float], user: Dict[str, float]) -> float:
+# the benchmark never changes, so normalize it once at module load
+sp500_normalized_sectors = normalize_sector_allocations(sp500_sectors)
+
+def calculate_similarity(user: Dict[str, float]) -> float:
     print("Calculating similarity between SP500 and user sector allocations")
-    sp500_normalized = normalize_sector_allocations(sp500)
+    sp500_normalized = sp500_normalized_sectors
     user_normalized = normalize_sector_allocations(user)
     
     all_sectors = set(sp500_normalized.keys()) | set(user_normalized.keys())
-    
-    sp500_vector = [sp500_normalized.get(sector, 0.0) for sector in all_sectors]
-    user_vector = [user_normalized.get(sector, 0.0) for sector in all_sectors]
-    
-    dot_product = sum(a * b for a, b in zip(sp500_vector, user_vector))
-    magnitude_sp500 = math.sqrt(sum(a * a for a in sp500_vector))
-    magnitude_user = math.sqrt(sum(b * b for b in user_vector))
-    
-    if magnitude_sp500 == 0 or magnitude_user == 0:
+
+    dot_product = 0.0
+    magnitude_sp500_sq = 0.0
+    magnitude_user_sq = 0.0
+    for sector in all_sectors:
+        a = sp500_normalized.get(sector, 0.0)
+        b = user_normalized.get(sector, 0.0)
+        dot_product += a * b
+        magnitude_sp500_sq += a * a
+        magnitude_user_sq += b * b
+
+    if magnitude_sp500_sq == 0 or magnitude_user_sq == 0:
         return 0.0
-    
-    cosine_similarity = dot_product / (magnitude_sp500 * magnitude_user)
+
+    cosine_similarity = dot_product / math.sqrt(magnitude_sp500_sq * magnitude_user_sq)
     similarity_percentage = round(cosine_similarity * 100, 2)
     print(f"Similarity calculation complete: {similarity_percentage}%")
     return similarity_percentage
 
 def get_bias_analysis(sp500: Dict[str, float], user: Dict[str, float], similarity: float) -> str:
     print(f"Getting bias analysis from Bedrock for similarity: {similarity}%")
-    bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-    
+    bedrock = bedrock_client
+
     prompt = f"""
     Analyze the following sector allocation data and provide a brief, easy-to-understand insight about this portfolio's investment approach:
     
@@ -69,17 +91,8 @@ def get_bias_analysis(sp500: Dict[str, float], user: Dict[str, float], similarit
     
     try:
         response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-sonnet-20240229-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 200,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }),
+            modelId=BEDROCK_MODEL_ID,
+            body=BEDROCK_BODY_PREFIX + json.dumps(prompt) + BEDROCK_BODY_SUFFIX,
             contentType='application/json'
         )
         
@@ -92,6 +105,20 @@ def get_bias_analysis(sp500: Dict[str, float], user: Dict[str, float], similarit
         print(f"Error getting analysis from Bedrock: {str(e)}")
         raise Exception(f"Failed to get analysis from Bedrock: {str(e)}")
 
+@lru_cache(maxsize=128)
+def _bias_analysis_for(user_items, similarity_q):
+    return get_bias_analysis(sp500_sectors, dict(user_items), similarity_q)
+
+def get_bias_analysis_cached(user: Dict[str, float], similarity: float) -> str:
+    """Memoized get_bias_analysis keyed on quantized allocations.
+
+    Rounding the user allocations and similarity before hashing lets warm
+    containers skip repeat Bedrock round-trips for near-identical
+    portfolios.
+    """
+    user_items = tuple(sorted((sector, round(percentage, 1)) for sector, percentage in user.items()))
+    return _bias_analysis_for(user_items, round(similarity, 1))
+
 def process_holdings_to_sectors(holdings: List[Dict[str, Any]]) -> Dict[str, float]:
     print(f"Processing {len(holdings)} holdings for sector analysis")
     sector_allocations = {}
@@ -111,8 +138,8 @@ def process_holdings_to_sectors(holdings: List[Dict[str, Any]]) -> Dict[str, flo
 def save_to_s3(bucket_name: str, key: str, data: Dict[str, Any]) -> bool:
     try:
         print(f"Attempting to save to S3 bucket: {bucket_name}, key: {key}")
-        s3 = boto3.client('s3')
-        
+        s3 = s3_client
+
         try:
             s3.head_bucket(Bucket=bucket_name)
             print(f"S3 bucket '{bucket_name}' exists and is accessible")
@@ -120,11 +147,11 @@ def save_to_s3(bucket_name: str, key: str, data: Dict[str, Any]) -> bool:
             print(f"Error accessing S3 bucket '{bucket_name}': {str(bucket_error)}")
             return False
         
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=key,
-            Body=json.dumps(data, indent=2),
-            ContentType='application/json'
+        s3.upload_fileobj(
+            io.BytesIO(gzip.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))),
+            bucket_name,
+            key,
+            ExtraArgs={'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
         )
         print(f"Successfully saved to S3: s3://{bucket_name}/{key}")
         return True
@@ -180,24 +207,26 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         user_sectors = process_holdings_to_sectors(holdings)
         
         print("Calculating similarity with SP500 sectors")
-        similarity = calculate_similarity(sp500_sectors, user_sectors)
+        similarity = calculate_similarity(user_sectors)
         
         print("Getting bias analysis from Bedrock")
-        bias_analysis = get_bias_analysis(sp500_sectors, user_sectors, similarity)
-        
+        bias_future = bedrock_executor.submit(get_bias_analysis_cached, user_sectors, similarity)
+
         response_data = {
             'unique_identifier': unique_identifier,
             'timestamp': datetime.utcnow().isoformat(),
             'sp500_sectors': sp500_sectors,
             'user_sectors': user_sectors,
-            'similarity_percentage': similarity,
-            'bias_analysis': bias_analysis
+            'similarity_percentage': similarity
         }
-        
+
         bucket_name = 'hidden-for-github'
         s3_key = f'results/{unique_identifier}/sector_results.json'
         print(f"Saving results to S3: s3://{bucket_name}/{s3_key}")
-        
+
+        # the analysis text ships in the result body, so join just before the upload
+        response_data['bias_analysis'] = bias_future.result()
+
         success = save_to_s3(bucket_name, s3_key, response_data)
         
         if success:
@@ -206,7 +235,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({
                     'message': 'Analysis completed successfully',
                     'unique_identifier': unique_identifier,
-                    's3_location': f's3://{bucket_name}/{s3_key}'
+                    's3_location': f's3://{bucket_name}/{s3_key}',
+                    'result': response_data
                 })
             }
         else:
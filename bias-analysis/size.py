@@ -1,6 +1,10 @@
 import json
+import io
+import gzip
 import boto3
 import math
+import bisect
+import heapq
 
 s3_client = boto3.client('s3')
 RESULTS_BUCKET = "hidden-for-github"
@@ -19,19 +23,22 @@ def cosine_similarity(portfolio, market):
         return 0.0
     return round((dot / (norm_a * norm_b)) * 100, 2)
 
+# market-cap buckets, smallest to largest; bisect_right gives the label index
+CAP_THRESHOLDS = [50_000_000, 300_000_000, 2_000_000_000, 10_000_000_000, 200_000_000_000]
+CAP_LABELS = ['Nano-cap', 'Micro-cap', 'Small-cap', 'Mid-cap', 'Large-cap', 'Mega-cap']
+
+CAP_SUFFIXES = {
+    'T': 1_000_000_000_000,
+    'B': 1_000_000_000,
+    'M': 1_000_000
+}
+
 def parse_market_cap(market_cap_str):
         if not market_cap_str:
             return 0
         market_cap_str = market_cap_str.upper().replace(',', '').strip()
-        multiplier = 1
-        if market_cap_str.endswith('T'):
-            multiplier = 1_000_000_000_000
-            market_cap_str = market_cap_str[:-1]
-        elif market_cap_str.endswith('B'):
-            multiplier = 1_000_000_000
-            market_cap_str = market_cap_str[:-1]
-        elif market_cap_str.endswith('M'):
-            multiplier = 1_000_000
+        multiplier = CAP_SUFFIXES.get(market_cap_str[-1:], 1)
+        if multiplier != 1:
             market_cap_str = market_cap_str[:-1]
         try:
             return float(market_cap_str) * multiplier
@@ -60,19 +67,9 @@ def lambda_handler(event, context):
         for holding in holdings:
             market_cap = holding.get('market-cap')
             market_num = parse_market_cap(market_cap)
-    
-            if market_num > 200_000_000_000:
-                cap_counts['Mega-cap'] += 1
-            elif 10_000_000_000 <= market_num <= 200_000_000_000:
-                cap_counts['Large-cap'] += 1
-            elif 2_000_000_000 <= market_num < 10_000_000_000:
-                cap_counts['Mid-cap'] += 1
-            elif 300_000_000 <= market_num < 2_000_000_000:
-                cap_counts['Small-cap'] += 1
-            elif 50_000_000 <= market_num < 300_000_000:
-                cap_counts['Micro-cap'] += 1
-            else:
-                cap_counts['Nano-cap'] += 1
+
+            cap = CAP_LABELS[bisect.bisect_right(CAP_THRESHOLDS, market_num)]
+            cap_counts[cap] += 1
         cap_percentages = {cap: round((count / total_holdings) * 100, 2) if total_holdings else 0 for cap, count in cap_counts.items()}
         print(cap_percentages)
 
@@ -88,11 +85,11 @@ def lambda_handler(event, context):
         similarity = cosine_similarity(cap_percentages, global_market)
 
 
-        top_holdings = sorted(
+        top_holdings = heapq.nlargest(
+            4,
             holdings,
-            key=lambda x: x.get("total_gain_percent", 0),
-            reverse=True
-        )[:4]
+            key=lambda x: x.get("total_gain_percent", 0)
+        )
 
         top_holdings_summary = [
             {
@@ -114,13 +111,18 @@ def lambda_handler(event, context):
 
         s3_key = f"results/{uniqueIdentifier}/size_results.json"
 
-        s3_client.put_object(
-            Bucket=RESULTS_BUCKET,
-            Key=s3_key,
-            Body=json.dumps(result),
-            ContentType='application/json'
+        s3_client.upload_fileobj(
+            io.BytesIO(gzip.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))),
+            RESULTS_BUCKET,
+            s3_key,
+            ExtraArgs={'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
         )
-        
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'result': result})
+        }
+
     except Exception as e:
         print(f"Error: {str(e)}")
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
\ No newline at end of file
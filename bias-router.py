@@ -1,111 +1,99 @@
 import json
+import gzip
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote_plus
 
 s3_client = boto3.client('s3')
 lambda_client = boto3.client('lambda')
 
-def prepare_volatility_data(portfolio_data):
+def prepare_analysis_data(portfolio_data):
+    """Build every analyzer's payload in a single pass over the holdings."""
     holdings = portfolio_data.get('holdings', [])
-    filtered_holdings = []
-    
-    for holding in holdings:
-        analysis = holding.get('analysis', {})
-        filtered_holdings.append({
-            'symbol': holding.get('symbol'),
-            'portfolio_percentage': holding.get('portfolio_percentage', 0),
-            'beta': holding.get('beta'),
-            'sharpe': analysis.get('sharpe_ratio'),
-            'asset_type': analysis.get('asset_type')
-        })
-    print(f"Filtered holdings: {filtered_holdings}")
-    return {'holdings': filtered_holdings}
 
-def prepare_sector_data(portfolio_data):
-    holdings = portfolio_data.get('holdings', [])
-    filtered_holdings = []
+    volatility_holdings = []
+    sector_holdings = []
+    size_holdings = []
+    location_holdings = []
+    momentum_holdings = []
+    recency_holdings = []
 
     for holding in holdings:
         analysis = holding.get('analysis', {})
         asset_type = analysis.get('asset_type')
+        portfolio_percentage = holding.get('portfolio_percentage', 0)
 
-        if asset_type == 'ETF':
-            continue
-        else:
-            filtered_holdings.append({
-                'symbol': holding.get('symbol'),
-                'portfolio_percentage': holding.get('portfolio_percentage', 0),
-                'sector': analysis.get('sector'),
-            })
-    return {'holdings': filtered_holdings}
-
-def prepare_size_data(portfolio_data):
-    holdings = portfolio_data.get('holdings', [])
-    filtered_holdings = []
+        volatility_holdings.append({
+            'symbol': holding.get('symbol'),
+            'portfolio_percentage': portfolio_percentage,
+            'beta': holding.get('beta'),
+            'sharpe': analysis.get('sharpe_ratio'),
+            'asset_type': asset_type
+        })
 
-    for holding in holdings:
-        filtered_holdings.append({
-            'symbol':holding.get('symbol'),
+        size_holdings.append({
+            'symbol': holding.get('symbol'),
             'market-cap': holding.get('market_cap'),
             'total_gain_percent': holding.get('total_gain_percent'),
             'value': holding.get('value')
         })
-    return {'holdings': filtered_holdings}
-
-def prepare_location_data(portfolio_data):
-    holdings = portfolio_data.get('holdings', [])
-    filtered_holdings = []
-
-    for holding in holdings:
-        analysis = holding.get('analysis', {})
-        asset_type = analysis.get('asset_type')
 
+        # the remaining analyzers only look at non-ETF holdings
         if asset_type == 'ETF':
             continue
-        else:
-            company_info = analysis.get('hq_location', {})
-            region = company_info.get('city') or company_info.get('state')
-
-            filtered_holdings.append({
-                'portfolio_percentage': holding.get('portfolio_percentage', 0),
-                'country': company_info.get('country'),
-                'region': region
-            })
-    return {'holdings': filtered_holdings}
 
-def prepare_momentum_data(portfolio_data):
-    holdings = portfolio_data.get('holdings', [])
-    filtered_holdings = []
-    
-    for holding in holdings:
-        analysis = holding.get('analysis', {})
-        asset_type = analysis.get('asset_type')
+        sector_holdings.append({
+            'symbol': holding.get('symbol'),
+            'portfolio_percentage': portfolio_percentage,
+            'sector': analysis.get('sector'),
+        })
 
-        if asset_type == 'ETF':
-            continue
-        else:
-            filtered_holdings.append({
-                'portfolio_percentage': holding.get('portfolio_percentage', 0),
-                'trailing_return_1m': analysis.get('trailing_return_1m')
-            })
-    print(f"Filtered holdings: {filtered_holdings}")
-    return {'holdings': filtered_holdings}
+        company_info = analysis.get('hq_location', {})
+        region = company_info.get('city') or company_info.get('state')
+        location_holdings.append({
+            'portfolio_percentage': portfolio_percentage,
+            'country': company_info.get('country'),
+            'region': region
+        })
 
-def prepare_recency_data(portfolio_data):
-    holdings = portfolio_data.get('holdings', [])
-    filtered_holdings = []    
-    for holding in holdings:
-        analysis = holding.get('analysis', {})
-        asset_type = analysis.get('asset_type')
+        momentum_holdings.append({
+            'portfolio_percentage': portfolio_percentage,
+            'trailing_return_1m': analysis.get('trailing_return_1m')
+        })
 
-        if asset_type == 'ETF':
-            continue
-        else:
-            filtered_holdings.append({
-                'symbol' :  holding.get("symbol")
-            })
-    print(f"Filtered holdings: {filtered_holdings}")
-    return {'holdings': filtered_holdings}
+        recency_holdings.append({
+            'symbol': holding.get('symbol')
+        })
+
+    print(f"Prepared payloads for {len(holdings)} holdings ({len(recency_holdings)} non-ETF)")
+
+    payloads = {
+        'portfolio-volatility-analysis': {'holdings': volatility_holdings},
+        'portfolio-sector-analysis': {'holdings': sector_holdings},
+        'portfolio-size-analysis': {'holdings': size_holdings},
+        'portfolio-location-analysis': {'holdings': location_holdings},
+        'portfolio-momentum-analysis': {'holdings': momentum_holdings},
+    }
+    return payloads, {'holdings': recency_holdings}
+
+# each analysis Lambda is independent; the router invokes them all
+# concurrently and collects each one's result from its response body
+ANALYSIS_LAMBDAS = [
+    'portfolio-volatility-analysis',
+    'portfolio-sector-analysis',
+    'portfolio-size-analysis',
+    'portfolio-location-analysis',
+    'portfolio-momentum-analysis',
+]
+
+# maps each analyzer to its key in the compiled results document
+RESULT_KEYS = {
+    'portfolio-volatility-analysis': 'volatility_results',
+    'portfolio-sector-analysis': 'sector_results',
+    'portfolio-size-analysis': 'size_results',
+    'portfolio-location-analysis': 'location_results',
+    'portfolio-momentum-analysis': 'momentum_results',
+}
 
 def invoke_lambda(function_name, payload, uniqueIdentifier):
     try:
@@ -114,72 +102,88 @@ def invoke_lambda(function_name, payload, uniqueIdentifier):
         "data": payload
         }
         print(f"Invoking {function_name}...")
-        lambda_client.invoke(
+        response = lambda_client.invoke(
             FunctionName=function_name,
-            InvocationType='Event',
-            Payload= json.dumps(event_payload)
+            InvocationType='RequestResponse',
+            Payload=json.dumps(event_payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
         )
-        print(f"{function_name} invoked")
+        response_payload = json.load(response['Payload'])
+        print(f"{function_name} completed")
+        if not isinstance(response_payload, dict):
+            return None
+        body = json.loads(response_payload.get('body') or '{}')
+        return body.get('result')
     except Exception as e:
         print(f"Error invoking {function_name}: {str(e)}")
+        return None
+
+def process_record(record):
+    source_bucket = record['s3']['bucket']['name']
+    source_key = unquote_plus(record['s3']['object']['key'])
+
+    parts = source_key.split("/")
+    if len(parts) >= 3:
+        uniqueIdentifier = parts[1]
+        fileName = parts[-1].rsplit(".", 1)[0]
+    else:
+        raise ValueError(f"Invalid S3 key format: {source_key}")
+
+    print(f"Processing: s3://{source_bucket}/{source_key}")
+
+    # Download portfolio JSON from S3; the Vercel enricher writes it gzipped
+    response = s3_client.get_object(Bucket=source_bucket, Key=source_key)
+    body = response['Body'].read()
+    if response.get('ContentEncoding') == 'gzip':
+        body = gzip.decompress(body)
+    portfolio_data = json.loads(body)
+
+    print(f"Loaded portfolio with {len(portfolio_data.get('holdings', []))} holdings")
+
+    payloads, recency_data = prepare_analysis_data(portfolio_data)
+
+    # synchronous fan-out: each analyzer hands back its result payload,
+    # so the compiler gets its inputs inline instead of racing the
+    # analyzers' S3 writes
+    with ThreadPoolExecutor(max_workers=len(ANALYSIS_LAMBDAS)) as executor:
+        futures = {
+            function_name: executor.submit(invoke_lambda, function_name, payloads[function_name], uniqueIdentifier)
+            for function_name in ANALYSIS_LAMBDAS
+        }
 
-def lambda_handler(event, context):
-    try:
-        print(f"Event received: {json.dumps(event)}")
-        if 'Records' not in event:
-            return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid event format'})}
-        
-        record = event['Records'][0]
-        source_bucket = record['s3']['bucket']['name']
-        source_key = unquote_plus(record['s3']['object']['key'])
-
-        parts = source_key.split("/")
-        if len(parts) >= 3:
-            uniqueIdentifier = parts[1] 
-            fileName = parts[-1].rsplit(".", 1)[0] 
-        else:
-            raise ValueError(f"Invalid S3 key format: {source_key}")
-        
-        print(f"Processing: s3://{source_bucket}/{source_key}")
-        
-        # Download portfolio JSON from S3
-        response = s3_client.get_object(Bucket=source_bucket, Key=source_key)
-        portfolio_data = json.loads(response['Body'].read().decode('utf-8'))
-        
-        print(f"Loaded portfolio with {len(portfolio_data.get('holdings', []))} holdings")
-        
-
-        volatility_data = prepare_volatility_data(portfolio_data)
-        invoke_lambda('portfolio-volatility-analysis', volatility_data, uniqueIdentifier)
-        
-        sector_data = prepare_sector_data(portfolio_data)
-        invoke_lambda('portfolio-sector-analysis', sector_data, uniqueIdentifier)
+    results = {}
+    for function_name, future in futures.items():
+        result = future.result()
+        if result is not None:
+            results[RESULT_KEYS[function_name]] = result
 
-        size_data = prepare_size_data(portfolio_data)
-        invoke_lambda('portfolio-size-analysis', size_data, uniqueIdentifier)
+    event_payload = {
+        "uniqueIdentifier": uniqueIdentifier,
+        "results": results
+    }
+    lambda_client.invoke(
+        FunctionName='result_compiler',
+        InvocationType='Event',
+        Payload=json.dumps(event_payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    )
 
-        location_data = prepare_location_data(portfolio_data)
-        invoke_lambda('portfolio-location-analysis', location_data, uniqueIdentifier)
+    return f's3://{source_bucket}/{source_key}'
 
-        momentum_data = prepare_momentum_data(portfolio_data)
-        invoke_lambda('portfolio-momentum-analysis', momentum_data, uniqueIdentifier)
+def lambda_handler(event, context):
+    try:
+        records = event.get('Records')
+        print(f"Event received with {len(records or [])} records")
+        if not records:
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid event format'})}
 
-        recency_data = prepare_recency_data(portfolio_data)
+        # S3 usually delivers one record per event, but batch deliveries
+        # are valid, so route every uploaded portfolio in the event
+        sources = [process_record(record) for record in records]
 
-        event_payload= { 
-            "uniqueIdentifier": uniqueIdentifier
-        }
-        lambda_client.invoke(
-            FunctionName='result_compiler',
-            InvocationType='Event',
-            Payload= json.dumps(event_payload)
-        )
-        
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Portfolio analysis Lambdas invoked successfully',
-                'source': f's3://{source_bucket}/{source_key}'
+                'sources': sources
             })
         }
         
@@ -2,7 +2,7 @@ import json
 import boto3
 import csv
 import io
-import urllib.parse
+from urllib.parse import unquote_plus
 from datetime import datetime
 from typing import Dict, Any
 
@@ -10,55 +10,44 @@ s3_client = boto3.client("s3")
 
 DESTINATION_BUCKET = "hidden-for-github"
 
+def _num(value):
+    return float(value) if value else 0
+
+def _text(value):
+    return value if value else ""
+
+# holdings columns in CSV order with their converters, built once at import
+HOLDING_COLUMNS = (
+    ("symbol", str),
+    ("days_gain_dollar", _num),
+    ("days_gain_percent", _num),
+    ("quantity", _num),
+    ("total_gain_dollar", _num),
+    ("total_gain_percent", _num),
+    ("last_price", _num),
+    ("value", _num),
+    ("portfolio_percentage", _num),
+    ("dividend_yield", _num),
+    ("pe_ratio", _num),
+    ("eps", _num),
+    ("market_cap", _text),
+    ("beta", _num),
+)
+
 def lambda_handler(event, context):
     try:
-        print("Event received:", json.dumps(event))
-
-        record = event["Records"][0]
-        source_bucket = record["s3"]["bucket"]["name"]
-        source_key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
-
-        print(f"Triggered by upload: s3://{source_bucket}/{source_key}")
-
-        # Download CSV
-        response = s3_client.get_object(Bucket=source_bucket, Key=source_key)
-        csv_content = response["Body"].read().decode("utf-8")
-        print(f"Downloaded CSV ({len(csv_content)} bytes)")
-
-        # Parse CSV
-        portfolio_data = parse_portfolio_csv(csv_content)
-        print(f"Parsed {len(portfolio_data['holdings'])} holdings successfully")
-
-        json_output = {
-            "metadata": {
-                "processed_at": datetime.utcnow().isoformat(),
-                "source_file": f"s3://{source_bucket}/{source_key}",
-                "total_holdings": len(portfolio_data["holdings"]),
-                "account_value": portfolio_data["account_summary"].get("Net Account Value", 0),
-            },
-            "account_summary": portfolio_data["account_summary"],
-            "holdings": portfolio_data["holdings"],
-        }
+        records = event.get("Records", [])
+        print(f"Event received with {len(records)} records")
 
-        filename = source_key.split("/")[-1]
-        identifier, original_filename = filename.split("-", 1)
-        base_name = original_filename.rsplit(".", 1)[0]
-        destination_key = f"csv-uploads/{identifier}/{base_name}.json"
-            
-        s3_client.put_object(
-            Bucket=DESTINATION_BUCKET,
-            Key=destination_key,
-            Body=json.dumps(json_output, indent=2),
-            ContentType="application/json",
-        )
+        # S3 usually delivers one record per event, but batch deliveries
+        # are valid, so convert every uploaded file in the event
+        results = [process_record(record) for record in records]
 
         return {
             "statusCode": 200,
             "body": json.dumps({
                 "message": "Portfolio data successfully converted to JSON",
-                "source": f"s3://{source_bucket}/{source_key}",
-                "destination": f"s3://{DESTINATION_BUCKET}/{destination_key}",
-                "holdings_count": len(portfolio_data["holdings"]),
+                "results": results,
             }),
         }
 
@@ -70,63 +59,105 @@ def lambda_handler(event, context):
         }
 
 
-def parse_portfolio_csv(csv_content: str) -> Dict[str, Any]:
+def process_record(record):
+    source_bucket = record["s3"]["bucket"]["name"]
+    source_key = unquote_plus(record["s3"]["object"]["key"])
+
+    print(f"Triggered by upload: s3://{source_bucket}/{source_key}")
+
+    # Download CSV
+    response = s3_client.get_object(Bucket=source_bucket, Key=source_key)
+    csv_content = response["Body"].read().decode("utf-8")
+    print(f"Downloaded CSV ({len(csv_content)} bytes)")
+
+    # Parse CSV
+    portfolio_data = parse_portfolio_csv(csv_content)
+    print(f"Parsed {len(portfolio_data['holdings'])} holdings successfully")
+
+    json_output = {
+        "metadata": {
+            "processed_at": datetime.utcnow().isoformat(),
+            "source_file": f"s3://{source_bucket}/{source_key}",
+            "total_holdings": len(portfolio_data["holdings"]),
+            "account_value": portfolio_data["account_summary"].get("Net Account Value", 0),
+        },
+        "account_summary": portfolio_data["account_summary"],
+        "holdings": portfolio_data["holdings"],
+    }
+
+    filename = source_key.split("/")[-1]
+    identifier, original_filename = filename.split("-", 1)
+    base_name = original_filename.rsplit(".", 1)[0]
+    destination_key = f"csv-uploads/{identifier}/{base_name}.json"
 
-    csv_reader = csv.reader(io.StringIO(csv_content))
-    rows = list(csv_reader)
-    print(f"CSV has {len(rows)} rows")
+    s3_client.put_object(
+        Bucket=DESTINATION_BUCKET,
+        Key=destination_key,
+        Body=json.dumps(json_output, separators=(",", ":")).encode("utf-8"),
+        ContentType="application/json",
+    )
+
+    return {
+        "source": f"s3://{source_bucket}/{source_key}",
+        "destination": f"s3://{DESTINATION_BUCKET}/{destination_key}",
+        "holdings_count": len(portfolio_data["holdings"]),
+    }
+
+
+def parse_portfolio_csv(csv_content: str) -> Dict[str, Any]:
 
-    holdings_start = None
     account_summary = {}
+    holdings = []
+    in_holdings = False
+    account_row_next = False
+    row_count = 0
+
+    # single pass: section headers flip state and the rows are consumed
+    # as they stream off the reader, so the CSV is never materialized
+    for i, row in enumerate(csv.reader(io.StringIO(csv_content))):
+        row_count = i + 1
+
+        if account_row_next:
+            account_row_next = False
+            try:
+                account_summary = {
+                    "Account": row[0].strip('"'),
+                    "Net Account Value": _num(row[1]),
+                    "Total Gain $": _num(row[2]),
+                    "Total Gain %": _num(row[3]),
+                    "Day's Gain Unrealized $": _num(row[4]),
+                    "Day's Gain Unrealized %": _num(row[5]),
+                    "Available For Withdrawal": _num(row[6]),
+                    "Cash Purchasing Power": _num(row[7]),
+                }
+                print("Account summary parsed successfully")
+            except ValueError:
+                print("Error parsing account summary row.")
+            continue
 
-    for i, row in enumerate(rows):
         if len(row) > 0 and row[0] == "Symbol" and "Day's Gain $" in row:
-            holdings_start = i
+            in_holdings = True
             print(f"Found holdings header at row {i}")
-        elif len(row) > 0 and "Account" in row[0] and "Net Account Value" in row:
-            print(f"Found account summary header at row {i}")
-            if i + 1 < len(rows):
-                account_data = rows[i + 1]
-                try:
-                    account_summary = {
-                        "Account": account_data[0].strip('"'),
-                        "Net Account Value": float(account_data[1]) if account_data[1] else 0,
-                        "Total Gain $": float(account_data[2]) if account_data[2] else 0,
-                        "Total Gain %": float(account_data[3]) if account_data[3] else 0,
-                        "Day's Gain Unrealized $": float(account_data[4]) if account_data[4] else 0,
-                        "Day's Gain Unrealized %": float(account_data[5]) if account_data[5] else 0,
-                        "Available For Withdrawal": float(account_data[6]) if account_data[6] else 0,
-                        "Cash Purchasing Power": float(account_data[7]) if account_data[7] else 0,
-                    }
-                    print("Account summary parsed successfully")
-                except ValueError:
-                    print("Error parsing account summary row.")
+            continue
 
-    holdings = []
-    if holdings_start is not None:
-        for i in range(holdings_start + 1, len(rows)):
-            row = rows[i]
-            if len(row) >= 13 and row[0] not in ("TOTAL", "CASH", ""):
-                try:
-                    holdings.append({
-                        "symbol": row[0],
-                        "days_gain_dollar": float(row[1]) if row[1] else 0,
-                        "days_gain_percent": float(row[2]) if row[2] else 0,
-                        "quantity": float(row[3]) if row[3] else 0,
-                        "total_gain_dollar": float(row[4]) if row[4] else 0,
-                        "total_gain_percent": float(row[5]) if row[5] else 0,
-                        "last_price": float(row[6]) if row[6] else 0,
-                        "value": float(row[7]) if row[7] else 0,
-                        "portfolio_percentage": float(row[8]) if row[8] else 0,
-                        "dividend_yield": float(row[9]) if row[9] else 0,
-                        "pe_ratio": float(row[10]) if row[10] else 0,
-                        "eps": float(row[11]) if row[11] else 0,
-                        "market_cap": row[12] if row[12] else "",
-                        "beta": float(row[13]) if row[13] else 0,
-                    })
-                except (ValueError, IndexError):
-                    print(f"Skipping malformed row {i}")
-                    continue
+        if len(row) > 0 and "Account" in row[0] and "Net Account Value" in row:
+            print(f"Found account summary header at row {i}")
+            account_row_next = True
+            continue
+
+        if in_holdings and len(row) >= 13 and row[0] not in ("TOTAL", "CASH", ""):
+            try:
+                if len(row) < len(HOLDING_COLUMNS):
+                    raise IndexError(f"expected {len(HOLDING_COLUMNS)} columns, got {len(row)}")
+                holdings.append({
+                    field: convert(value)
+                    for (field, convert), value in zip(HOLDING_COLUMNS, row)
+                })
+            except (ValueError, IndexError):
+                print(f"Skipping malformed row {i}")
+                continue
+
+    print(f"CSV has {row_count} rows")
     print(f"Extracted {len(holdings)} valid holdings")
 
     return {"account_summary": account_summary, "holdings": holdings}
@@ -2,15 +2,21 @@ import json
 import os
 import logging
 from datetime import datetime, timedelta
-import boto3
-from botocore.exceptions import ClientError
-import urllib.parse
+from urllib.parse import unquote_plus
 import requests
+from requests.adapters import HTTPAdapter, Retry
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client('s3')
+# keep-alive session with retries for transient gateway errors from Vercel
+session = requests.Session()
+session.mount('https://', HTTPAdapter(max_retries=Retry(
+    total=3,
+    backoff_factor=1,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=['POST']
+)))
 
 def call_vercel_function(bucket, key):
     try:
@@ -21,7 +27,7 @@ def call_vercel_function(bucket, key):
         }
         
         logger.info(f"Calling Vercel function: {vercel_url}")
-        response = requests.post(
+        response = session.post(
             vercel_url,
             json=payload,
             headers={'Content-Type': 'application/json'},
@@ -59,7 +65,7 @@ def lambda_handler(event, context):
             record = event['Records'][0]
             if record.get('eventSource') == 'aws:s3':
                 bucket = record['s3']['bucket']['name']
-                key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+                key = unquote_plus(record['s3']['object']['key'])
                 logger.info(f"Processing S3 object: s3://{bucket}/{key}")
             else:
                 return {
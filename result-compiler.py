@@ -1,8 +1,24 @@
 import json
+import gzip
 import boto3
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 
 s3_client = boto3.client('s3')
 
+def fetch_result(bucket_name, prefix, filename):
+    key = f"{prefix}{filename}"
+    try:
+        s3_obj = s3_client.get_object(Bucket=bucket_name, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return filename, None
+    except ClientError as e:
+        raise Exception(f"Error reading {key}: {str(e)}")
+    body = s3_obj["Body"].read()
+    if s3_obj.get("ContentEncoding") == "gzip":
+        body = gzip.decompress(body)
+    return filename, json.loads(body)
+
 def lambda_handler(event, context):
 
     print(event);
@@ -19,37 +35,35 @@ def lambda_handler(event, context):
         "size_results.json",
         "volatility_results.json"
     ]
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+    # results passed inline by the router skip S3 entirely; anything not
+    # provided is fetched concurrently, with a missing key showing up as a
+    # None body, so no LIST round-trip is needed up front
+    provided_results = event.get("results") or {}
+    to_fetch = [f for f in required_files if f.replace(".json", "") not in provided_results]
 
-    if "Contents" not in response:
-        raise Exception(f"No files found under {prefix}")
+    fetched = {}
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=len(to_fetch)) as executor:
+            fetched = dict(executor.map(
+                lambda filename: fetch_result(bucket_name, prefix, filename),
+                to_fetch
+            ))
 
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-    if "Contents" not in response:
-        raise Exception(f"No files found under {prefix}")
-
-    found_files = [obj["Key"].replace(prefix, "") for obj in response["Contents"]]
-    missing_files = [f for f in required_files if f not in found_files]
+    missing_files = [filename for filename, data in fetched.items() if data is None]
     if missing_files:
         raise Exception(f"Missing required result files: {missing_files}")
 
     combined_data = {}
-
     for filename in required_files:
-        key = f"{prefix}{filename}"
-        try:
-            s3_obj = s3_client.get_object(Bucket=bucket_name, Key=key)
-            content = s3_obj["Body"].read().decode("utf-8")
-            combined_data[filename.replace(".json", "")] = json.loads(content)
-        except ClientError as e:
-            raise Exception(f"Error reading {key}: {str(e)}")
+        name = filename.replace(".json", "")
+        combined_data[name] = provided_results.get(name, fetched.get(filename))
 
     combined_key = f"{uniqueIdentifier}_combined_results.json"
     try:
         s3_client.put_object(
             Bucket=bucket_name,
             Key=combined_key,
-            Body=json.dumps(combined_data, indent=4),
+            Body=json.dumps(combined_data, separators=(",", ":")).encode("utf-8"),
             ContentType="application/json"
         )
         print(f"Combined JSON saved to {combined_key}")
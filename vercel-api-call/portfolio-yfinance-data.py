@@ -1,69 +1,115 @@
 import json
 import os
-import yfinance as yf
+import io
+import gzip
 import logging
 from datetime import datetime, timedelta
 import time
 import urllib.parse
 import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import hmac
 import hashlib
 import base64
-from yfinance import set_tz_cache_location
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Bunch of vercel timezone stuff
-set_tz_cache_location('/tmp')
 os.environ['TZ'] = 'UTC'
 
-try:
-    import zoneinfo
-    zoneinfo.ZoneInfo('UTC')
-    logger.info("Timezone data available")
-except Exception as e:
-    logger.warning(f"Timezone data not available: {str(e)}")
-
-class CustomTicker(yf.Ticker):
-    def __init__(self, ticker, session=None):
-        super().__init__(ticker, session)
-        self._tz = 'UTC'
-    
-    def _fetch_ticker_tz(self):
-        return 'UTC'
-    
-    def _get_tz(self):
-        return 'UTC'
+# yfinance drags pandas and numpy in at import time — several hundred
+# milliseconds of cold start — so the stack is loaded on first use;
+# OPTIONS preflights and early error exits never pay for it
+yf = None
+CustomTicker = None
+_yf_session = None
+
+def _init_yfinance():
+    global yf, CustomTicker, _yf_session
+    if yf is not None:
+        return
+
+    import yfinance
+    yf = yfinance
+
+    # one keep-alive session shared by every Ticker, so warm containers
+    # reuse the Yahoo TLS connection instead of handshaking per symbol
+    _yf_session = requests.Session()
+
+    # Bunch of vercel timezone stuff
+    yf.set_tz_cache_location('/tmp')
+
+    try:
+        import zoneinfo
+        zoneinfo.ZoneInfo('UTC')
+        logger.info("Timezone data available")
+    except Exception as e:
+        logger.warning(f"Timezone data not available: {str(e)}")
+
+    class _CustomTicker(yf.Ticker):
+        def __init__(self, ticker, session=None):
+            super().__init__(ticker, session or _yf_session)
+            self._tz = 'UTC'
+        
+        def _fetch_ticker_tz(self):
+            return 'UTC'
+        
+        def _get_tz(self):
+            return 'UTC'
+
+    CustomTicker = _CustomTicker
+
+# keep-alive session so repeated S3 calls reuse one TLS connection
+s3_session = requests.Session()
+s3_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[500, 502, 503, 504]
+    )
+))
+
+@lru_cache(maxsize=8)
+def _signing_key(secret_key, date_stamp, region, service):
+    """Derive the SigV4 signing key; it only changes when the UTC date rolls over."""
+    k_date = hmac.digest(f"AWS4{secret_key}".encode('utf-8'), date_stamp.encode('utf-8'), 'sha256')
+    k_region = hmac.digest(k_date, region.encode('utf-8'), 'sha256')
+    k_service = hmac.digest(k_region, service.encode('utf-8'), 'sha256')
+    return hmac.digest(k_service, b'aws4_request', 'sha256')
 
 # s3 calls
-def create_aws_signature(method, uri, query_string, headers, payload, region='us-east-1', service='s3'):
+def create_aws_signature(method, uri, query_string, headers, payload_hash, region='us-east-1', service='s3'):
     access_key = os.environ['AWS_ACCESS_KEY_ID']
     secret_key = os.environ['AWS_SECRET_ACCESS_KEY']
     
-    now = datetime.utcnow()
-    timestamp = now.strftime('%Y%m%dT%H%M%SZ')
-    date_stamp = now.strftime('%Y%m%d')
+    # %-formatting a gmtime tuple skips two locale-aware strftime calls
+    t = time.gmtime()
+    timestamp = '%04d%02d%02dT%02d%02d%02dZ' % (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+    date_stamp = timestamp[:8]
     
-    canonical_headers = '\n'.join([f"{k.lower()}:{v}" for k, v in sorted(headers.items())])
-    signed_headers = ';'.join([k.lower() for k in sorted(headers.keys())])
+    # one lowercase+sort feeds both header lines instead of sorting twice
+    header_items = sorted((k.lower(), v) for k, v in headers.items())
+    canonical_headers = '\n'.join(f"{k}:{v}" for k, v in header_items)
+    signed_headers = ';'.join(k for k, _ in header_items)
     
-    payload_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
-    
-    canonical_request = f"{method}\n{uri}\n{query_string}\n{canonical_headers}\n\n{signed_headers}\n{payload_hash}"
+    # feed the canonical request to the hash in pieces; the concatenated
+    # string itself is never needed, only its digest
+    canonical_hash = hashlib.sha256()
+    for piece in (method, '\n', uri, '\n', query_string, '\n',
+                  canonical_headers, '\n\n', signed_headers, '\n', payload_hash):
+        canonical_hash.update(piece.encode('utf-8'))
     
     credential_scope = f"{date_stamp}/{region}/{service}/aws4_request"
-    string_to_sign = f"AWS4-HMAC-SHA256\n{timestamp}\n{credential_scope}\n{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
-    
-    def sign(key, msg):
-        return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+    string_to_sign = f"AWS4-HMAC-SHA256\n{timestamp}\n{credential_scope}\n{canonical_hash.hexdigest()}"
     
-    k_date = sign(f"AWS4{secret_key}".encode('utf-8'), date_stamp)
-    k_region = sign(k_date, region)
-    k_service = sign(k_region, service)
-    k_signing = sign(k_service, 'aws4_request')
-    signature = sign(k_signing, string_to_sign)
+    k_signing = _signing_key(secret_key, date_stamp, region, service)
+    signature = hmac.digest(k_signing, string_to_sign.encode('utf-8'), 'sha256')
     
     authorization = f"AWS4-HMAC-SHA256 Credential={access_key}/{credential_scope}, SignedHeaders={signed_headers}, Signature={signature.hex()}"
     
@@ -79,12 +125,12 @@ def get_portfolio_from_s3_api(bucket, key):
             'x-amz-content-sha256': 'UNSIGNED-PAYLOAD'
         }
         
-        authorization, timestamp = create_aws_signature('GET', uri, query_string, headers, '')
+        authorization, timestamp = create_aws_signature('GET', uri, query_string, headers, 'UNSIGNED-PAYLOAD')
         headers['Authorization'] = authorization
         headers['x-amz-date'] = timestamp
         
         s3_url = f"https://{bucket}.s3.amazonaws.com/{key}"
-        response = requests.get(s3_url, headers=headers)
+        response = s3_session.get(s3_url, headers=headers)
         
         if response.status_code == 200:
             portfolio_data = response.json()
@@ -119,24 +165,31 @@ def upload_to_s3_api(enriched_portfolio, bucket_name=None, key=None):
                 raise ValueError("Invalid S3 key format")
         
         filename = f"processed/{uniqueIdentifier}/{fileName}.json"
-        portfolio_json = json.dumps(enriched_portfolio, default=str, indent=2)
+        # JSON compresses 5-10x, so gzip before hashing and signing; the
+        # ContentEncoding metadata lets readers decompress transparently
+        payload_bytes = gzip.compress(json.dumps(enriched_portfolio, default=str, separators=(',', ':')).encode('utf-8'))
         
         uri = f"/{filename}"
         query_string = ""
         
+        # hashed once; the same hex goes in the header and the signature
+        payload_hash = hashlib.sha256(payload_bytes).hexdigest()
         headers = {
             'Host': f"{bucket_name}.s3.amazonaws.com",
             'Content-Type': 'application/json',
-            'Content-Length': str(len(portfolio_json)),
-            'x-amz-content-sha256': hashlib.sha256(portfolio_json.encode('utf-8')).hexdigest()
+            'Content-Encoding': 'gzip',
+            'Content-Length': str(len(payload_bytes)),
+            'x-amz-content-sha256': payload_hash
         }
         
-        authorization, timestamp = create_aws_signature('PUT', uri, query_string, headers, portfolio_json)
+        authorization, timestamp = create_aws_signature('PUT', uri, query_string, headers, payload_hash)
         headers['Authorization'] = authorization
         headers['x-amz-date'] = timestamp
         
         s3_url = f"https://{bucket_name}.s3.amazonaws.com/{filename}"
-        response = requests.put(s3_url, data=portfolio_json, headers=headers)
+        # a file-like body with an explicit Content-Length streams from the
+        # buffer instead of being copied again into the socket layer
+        response = s3_session.put(s3_url, data=io.BytesIO(payload_bytes), headers=headers)
         
         if response.status_code == 200:
             logger.info(f"Successfully uploaded to s3://{bucket_name}/{filename}")
@@ -144,7 +197,7 @@ def upload_to_s3_api(enriched_portfolio, bucket_name=None, key=None):
                 'success': True,
                 'bucket': bucket_name,
                 'key': filename,
-                'size': len(portfolio_json)
+                'size': len(payload_bytes)
             }
         else:
             logger.error(f"S3 upload failed: {response.status_code} - {response.text}")
@@ -155,6 +208,11 @@ def upload_to_s3_api(enriched_portfolio, bucket_name=None, key=None):
         return {'success': False, 'error': str(e)}
 
 
+# compiled once at import; each classification is then a single C-level
+# scan instead of a pile of Python substring checks per holding
+_CASH_RE = re.compile(r'cash|money market|treasury bill')
+_BOND_RE = re.compile(r'bond|fixed income')
+
 def get_asset_type(info, ticker_symbol=None):
     quote_type = info.get('quoteType', '').lower()
     category = info.get('category', '').lower()
@@ -163,11 +221,11 @@ def get_asset_type(info, ticker_symbol=None):
     # cash detection
     if ticker_symbol and ticker_symbol.lower() == 'cash':
         return 'CASH'
-    if any(word in long_name for word in ['cash', 'money market', 'treasury bill']):
+    if _CASH_RE.search(long_name):
         return 'CASH'
     
     # bond detection
-    if 'bond' in quote_type or 'bond' in category or 'bond' in long_name or 'fixed income' in category:
+    if _BOND_RE.search(f"{quote_type} {category} {long_name}"):
         return 'BOND'
     
     # etf detection
@@ -176,18 +234,45 @@ def get_asset_type(info, ticker_symbol=None):
     
     return 'STOCK'
 
-def get_ticker_info(ticker_symbol, max_retries=2, base_delay=5):
+# 15-minute TTL: covers repeat symbols within a request and warm-container
+# reuse across invocations without serving stale quotes
+CACHE_TTL_SECONDS = 900
+_info_cache = {}
+_hist_cache = {}
+
+def _cache_get(cache, symbol):
+    entry = cache.get(symbol)
+    if entry and time.time() - entry[0] < CACHE_TTL_SECONDS:
+        return entry[1]
+    return None
+
+def _rate_limit_wait(error, attempt):
+    """Backoff for a 429, preferring the server's Retry-After when exposed."""
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(60, int(retry_after))
+        except ValueError:
+            pass
+    return min(60, (2 ** attempt) + random.uniform(0, 1))
+
+def get_ticker_info(ticker_symbol, max_retries=2):
+    cached = _cache_get(_info_cache, ticker_symbol)
+    if cached is not None:
+        logger.info(f"Info cache hit for {ticker_symbol}")
+        return cached
+
+    _init_yfinance()
     for attempt in range(max_retries):
         try:
-            delay = base_delay * (attempt + 1) + random.uniform(2, 4)
-            logger.info(f"Fetching info for {ticker_symbol}, waiting {delay:.2f}s")
-            time.sleep(delay)
-            
+            logger.info(f"Fetching info for {ticker_symbol}")
             ticker = CustomTicker(ticker_symbol)
             info = ticker.info
             
             if info and len(info) > 1:
                 logger.info(f"Successfully retrieved info for {ticker_symbol}")
+                _info_cache[ticker_symbol] = (time.time(), (ticker, info))
                 return ticker, info
             else:
                 logger.warning(f"Empty response for {ticker_symbol}")
@@ -204,7 +289,7 @@ def get_ticker_info(ticker_symbol, max_retries=2, base_delay=5):
             if "429" in error_msg or "Too Many Requests" in error_msg:
                 logger.error(f"Rate limited for {ticker_symbol}: {error_msg}")
                 if attempt < max_retries - 1:
-                    time.sleep(15) 
+                    time.sleep(_rate_limit_wait(e, attempt))
                     continue
             else:
                 if attempt < max_retries - 1:
@@ -215,12 +300,15 @@ def get_ticker_info(ticker_symbol, max_retries=2, base_delay=5):
     return None, None
 
 def get_historical_data_single(symbol, max_retries=2):
+    cached = _cache_get(_hist_cache, symbol)
+    if cached is not None:
+        logger.info(f"History cache hit for {symbol}")
+        return cached
+
+    _init_yfinance()
     for attempt in range(max_retries):
         try:
-            delay = random.uniform(3, 5)
-            logger.info(f"Getting historical data for {symbol}, waiting {delay:.2f}s")
-            time.sleep(delay)
-            
+            logger.info(f"Getting historical data for {symbol}")
             end_date = datetime.now()
             if end_date.month <= 2:
                 start_date = end_date.replace(year=end_date.year-1, month=end_date.month+10)
@@ -237,6 +325,7 @@ def get_historical_data_single(symbol, max_retries=2):
                 hist = ticker.history(period="2mo", interval='1d')
                 if hist is not None and not hist.empty:
                     logger.info(f"Successfully retrieved historical data for {symbol} using period method")
+                    _hist_cache[symbol] = (time.time(), hist)
                     return hist
             except Exception as period_error:
                 logger.warning(f"Period method failed for {symbol}: {str(period_error)}")
@@ -245,18 +334,13 @@ def get_historical_data_single(symbol, max_retries=2):
                     hist = ticker.history(start=start_date, end=end_date, interval='1d')
                     if hist is not None and not hist.empty:
                         logger.info(f"Successfully retrieved historical data for {symbol} using date range method")
+                        _hist_cache[symbol] = (time.time(), hist)
                         return hist
                 except Exception as date_error:
+                    # if both daily queries failed the data isn't there; a
+                    # third weekly-interval request would be wasted quota
                     logger.warning(f"Date range method failed for {symbol}: {str(date_error)}")
-                    
-                    try:
-                        hist = ticker.history(period="2mo", interval='1wk')
-                        if hist is not None and not hist.empty:
-                            logger.info(f"Successfully retrieved historical data for {symbol} using weekly interval")
-                            return hist
-                    except Exception as weekly_error:
-                        logger.warning(f"Weekly interval method failed for {symbol}: {str(weekly_error)}")
-                        raise period_error
+                    raise period_error
             
             logger.warning(f"Empty historical data for {symbol}")
             return None
@@ -272,7 +356,7 @@ def get_historical_data_single(symbol, max_retries=2):
             if "429" in error_msg or "Too Many Requests" in error_msg:
                 logger.error(f"Rate limited for {symbol}: {error_msg}")
                 if attempt < max_retries - 1:
-                    time.sleep(15)
+                    time.sleep(_rate_limit_wait(e, attempt))
                     continue
             else:
                 if attempt < max_retries - 1:
@@ -282,83 +366,134 @@ def get_historical_data_single(symbol, max_retries=2):
     logger.error(f"Failed to get historical data for {symbol} after {max_retries} attempts")
     return None
 
-def enrich_holdings_batch(holdings):
-    logger.info(f"Starting batch enrichment for {len(holdings)} holdings")
-    
-    enriched_holdings = []
-    
-    for i, holding in enumerate(holdings):
-        symbol = holding.get("symbol")
-        if not symbol:
-            logger.warning("Skipping holding with no symbol")
-            continue
-            
-        logger.info(f"Enriching {symbol} ({i+1}/{len(holdings)})")
-        
-        enriched_data = holding.copy()
-        enriched_data["analysis"] = {
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        try:
-            ticker, info = get_ticker_info(symbol)
-            
-            if ticker is None or info is None:
-                enriched_data["analysis"]["error"] = "Failed to retrieve data"
-                enriched_holdings.append(enriched_data)
+def get_historical_data_batch(symbols):
+    """Fetch every symbol's history in one multiplexed yf.download call."""
+    if not symbols:
+        return {}
+    # runs on the main thread before the worker pool spins up, so it also
+    # serves as the one-time yfinance initialization for this invocation
+    _init_yfinance()
+    try:
+        logger.info(f"Batch downloading history for {len(symbols)} symbols")
+        hist_all = yf.download(
+            tickers=" ".join(symbols),
+            period="2mo",
+            interval="1d",
+            group_by="ticker",
+            threads=True,
+            progress=False,
+        )
+        if hist_all is None or hist_all.empty:
+            return {}
+
+        history = {}
+        for symbol in symbols:
+            try:
+                hist = hist_all[symbol] if len(symbols) > 1 else hist_all
+            except KeyError:
                 continue
-            
-            asset_type = get_asset_type(info, symbol)
-            enriched_data["analysis"]["asset_type"] = asset_type
-            
-            # location
-            if asset_type == 'STOCK':
-                sector = info.get('sector')
-                industry = info.get('industry')
-                enriched_data["analysis"]["sector"] = sector if sector else "Unknown"
-                enriched_data["analysis"]["industry"] = industry if industry else "Unknown"
-            elif asset_type == 'ETF':
-                enriched_data["analysis"]["category"] = info.get('category', 'Unknown')
-            
-            if asset_type == 'STOCK':
-                country = info.get('country')
-                city = info.get('city')
-                state = info.get('state')
-                
-                enriched_data["analysis"]["hq_location"] = {
-                    "country": country if country else "Unknown",
-                    "city": city if city else "Unknown",
-                    "state": state if state else None
-                }
-            
-            # prime momentum
-            if asset_type == 'STOCK':
-                try:
+            hist = hist.dropna(how="all")
+            if not hist.empty:
+                history[symbol] = hist
+
+        logger.info(f"Batch download returned data for {len(history)}/{len(symbols)} symbols")
+        return history
+    except Exception as e:
+        logger.warning(f"Batch history download failed: {str(e)}")
+        return {}
+
+# bounded so concurrent Yahoo requests stay under rate-limit pressure
+MAX_ENRICHMENT_WORKERS = 4
+
+def enrich_holding(holding, history=None):
+    symbol = holding.get("symbol")
+    if not symbol:
+        logger.warning("Skipping holding with no symbol")
+        return None
+
+    logger.info(f"Enriching {symbol}")
+
+    enriched_data = holding.copy()
+    enriched_data["analysis"] = {
+        "timestamp": datetime.now().isoformat()
+    }
+
+    try:
+        ticker, info = get_ticker_info(symbol)
+
+        if ticker is None or info is None:
+            enriched_data["analysis"]["error"] = "Failed to retrieve data"
+            return enriched_data
+
+        asset_type = get_asset_type(info, symbol)
+        enriched_data["analysis"]["asset_type"] = asset_type
+
+        # location
+        if asset_type == 'STOCK':
+            sector = info.get('sector')
+            industry = info.get('industry')
+            enriched_data["analysis"]["sector"] = sector if sector else "Unknown"
+            enriched_data["analysis"]["industry"] = industry if industry else "Unknown"
+        elif asset_type == 'ETF':
+            enriched_data["analysis"]["category"] = info.get('category', 'Unknown')
+
+        if asset_type == 'STOCK':
+            country = info.get('country')
+            city = info.get('city')
+            state = info.get('state')
+
+            enriched_data["analysis"]["hq_location"] = {
+                "country": country if country else "Unknown",
+                "city": city if city else "Unknown",
+                "state": state if state else None
+            }
+
+        # prime momentum
+        if asset_type == 'STOCK':
+            try:
+                hist = (history or {}).get(symbol)
+                if hist is None:
                     hist = get_historical_data_single(symbol)
-                    if hist is not None and not hist.empty and len(hist) >= 20:
-                        month_ago_price = hist['Close'].iloc[-21] if len(hist) >= 21 else hist['Close'].iloc[0]
-                        current_price = hist['Close'].iloc[-1]
-                        stock_return = ((current_price - month_ago_price) / month_ago_price) * 100
-                        
-                        enriched_data["analysis"]["price_momentum"] = {
-                            "stock_return_1m": round(stock_return, 2)
-                        }
-                except Exception as e:
-                    logger.warning(f"Failed to calculate momentum for {symbol}: {str(e)}")
-            
-            logger.info(f"Successfully enriched {symbol}")
-            enriched_holdings.append(enriched_data)
-            
-            if i < len(holdings) - 1:
-                delay = random.uniform(5, 8)
-                logger.info(f"Waiting {delay:.2f}s before next ticker")
-                time.sleep(delay)
-            
-        except Exception as e:
-            logger.error(f"Error enriching {symbol}: {str(e)}")
-            enriched_data["analysis"]["error"] = str(e)
-            enriched_holdings.append(enriched_data)
-    
+                if hist is not None and not hist.empty and len(hist) >= 20:
+                    # plain ndarray indexing skips pandas' label-alignment machinery
+                    closes = hist['Close'].to_numpy()
+                    month_ago_price = closes[-21] if len(closes) >= 21 else closes[0]
+                    current_price = closes[-1]
+                    stock_return = ((current_price - month_ago_price) / month_ago_price) * 100
+
+                    enriched_data["analysis"]["price_momentum"] = {
+                        "stock_return_1m": round(stock_return, 2)
+                    }
+            except Exception as e:
+                logger.warning(f"Failed to calculate momentum for {symbol}: {str(e)}")
+
+        logger.info(f"Successfully enriched {symbol}")
+        return enriched_data
+
+    except Exception as e:
+        logger.error(f"Error enriching {symbol}: {str(e)}")
+        enriched_data["analysis"]["error"] = str(e)
+        return enriched_data
+
+def enrich_holdings_batch(holdings):
+    logger.info(f"Starting batch enrichment for {len(holdings)} holdings")
+
+    # one multiplexed request covers every symbol's history; the per-symbol
+    # fetch inside enrich_holding only runs for symbols the batch missed.
+    # cash rows have no price history, so they never enter the batch
+    symbols = list(dict.fromkeys(
+        h["symbol"] for h in holdings
+        if h.get("symbol") and h["symbol"].lower() != "cash"
+    ))
+    history = get_historical_data_batch(symbols)
+
+    # holdings are independent; a small pool overlaps the network waits
+    with ThreadPoolExecutor(max_workers=MAX_ENRICHMENT_WORKERS) as executor:
+        enriched_holdings = [
+            enriched for enriched in executor.map(lambda h: enrich_holding(h, history), holdings)
+            if enriched is not None
+        ]
+
     logger.info(f"Batch enrichment complete: {len(enriched_holdings)} holdings processed")
     return enriched_holdings
 
@@ -453,7 +588,7 @@ def handler(request):
                 's3_upload': s3_result,
                 'holdings_processed': len(enriched_portfolio['holdings']),
                 'enriched_portfolio': enriched_portfolio
-            }, default=str)
+            }, default=str, separators=(',', ':'))
         }
         
     except Exception as e: